@@ -13,13 +13,25 @@ import threading
 import time
 import logging
 import random
+import socket
+import secrets
+import queue
+import argparse
+import traceback
+import cProfile
+import tracemalloc
 from collections import defaultdict
+from contextlib import contextmanager
 
 # --- Application Configuration ---
 CONFIG_FILE = "config.json"
 LOG_FILE = "log.csv"
 QUOTES_FILE = "quotes.json"
 APP_LOG_FILE = "log.log"
+PROFILE_FILE = "profile.prof"
+LOG_LOCK_FILE = "log.csv.lock"
+INSTANCE_LOCK_FILE = "focus.lock"
+INSTANCE_PORT_FILE = "focus.port"
 
 # Default settings
 DEFAULT_SETTINGS = {
@@ -29,7 +41,10 @@ DEFAULT_SETTINGS = {
     "status_indicator_enabled": True,
     "obstacle_sound_enabled": True,
     "theme": "light",
-    "last_backup_prompt_date": ""
+    "last_backup_prompt_date": "",
+    "watchdog_enabled": True,
+    "watchdog_threshold_ms": 1000,
+    "profiler_enabled_on_start": False
 }
 
 # --- Theme Color Palettes ---
@@ -46,9 +61,186 @@ THEMES = {
     }
 }
 
+def lock_file(handle, blocking=True):
+    """Takes an exclusive OS lock on an open file. Raises OSError if non-blocking and already held."""
+    if platform.system() == "Windows":
+        import msvcrt
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+def unlock_file(handle):
+    if platform.system() == "Windows":
+        import msvcrt
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+@contextmanager
+def file_lock(lock_path):
+    """Holds an exclusive lock on lock_path for the duration of the block, across processes."""
+    with open(lock_path, 'a') as handle:
+        lock_file(handle)
+        try:
+            yield
+        finally:
+            unlock_file(handle)
+
+class SingleInstance:
+    """Instance lock plus a local socket that later launches forward their requests to."""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.requests = queue.Queue()
+        self.token = secrets.token_hex(16)
+        self._lock_handle = None
+        self._server = None
+
+    def acquire(self):
+        """Returns True if this process is now the primary instance."""
+        handle = open(INSTANCE_LOCK_FILE, 'a')
+        try:
+            lock_file(handle, blocking=False)
+        except OSError:
+            handle.close()
+            return False
+        self._lock_handle = handle
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.bind(("127.0.0.1", 0))
+        self._server.listen()
+        tmp_path = INSTANCE_PORT_FILE + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"port": self._server.getsockname()[1], "token": self.token}, f)
+        os.replace(tmp_path, INSTANCE_PORT_FILE)
+        threading.Thread(target=self._serve, name="InstanceListener", daemon=True).start()
+        return True
+
+    def release(self):
+        if self._server:
+            self._server.close()
+            self._server = None
+        if self._lock_handle:
+            try:
+                os.remove(INSTANCE_PORT_FILE)
+            except OSError:
+                pass
+            unlock_file(self._lock_handle)
+            self._lock_handle.close()
+            self._lock_handle = None
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except (OSError, AttributeError):
+                return
+            with conn:
+                try:
+                    self._handle_connection(conn)
+                except Exception as e:
+                    self.logger.warning(f"Could not read instance request: {e}")
+
+    def _handle_connection(self, conn):
+        conn.settimeout(2)
+        with conn.makefile('r', encoding='utf-8') as reader:
+            request = json.loads(reader.readline())
+        if not isinstance(request, dict) or request.pop("token", None) != self.token:
+            self.logger.warning("Rejected invalid instance request.")
+            return
+        conn.sendall(b"ok\n")
+        self.requests.put(request)
+
+    def forward(self, request, timeout=2.0):
+        """Sends request to the primary instance. Retries briefly while it is still starting up."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with open(INSTANCE_PORT_FILE, 'r') as f:
+                    info = json.load(f)
+                with socket.create_connection(("127.0.0.1", info["port"]), timeout=timeout) as conn:
+                    conn.sendall((json.dumps({**request, "token": info["token"]}) + "\n").encode('utf-8'))
+                    with conn.makefile('r', encoding='utf-8') as reader:
+                        if reader.readline().strip() == "ok":
+                            return True
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+class MainloopWatchdog:
+    """Background thread that reports when the Tk mainloop stops servicing its heartbeat.
+
+    The heartbeat is an after() callback, so it keeps beating inside nested event loops
+    (wait_window, messagebox). Those are caught by the update_timer tick instead, which
+    stops arriving while update_timer is blocked in them.
+    """
+
+    def __init__(self, root_window, logger, threshold_ms=1000, heartbeat_ms=250, tick_interval_ms=1000):
+        self.root = root_window
+        self.logger = logger
+        self.threshold = threshold_ms / 1000
+        self.heartbeat_ms = heartbeat_ms
+        self.tick_interval = tick_interval_ms / 1000
+        self.tk_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.last_tick = None
+        self._stop_event = threading.Event()
+        self._after_id = None
+
+    def start(self):
+        self._beat()
+        threading.Thread(target=self._watch, name="MainloopWatchdog", daemon=True).start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._after_id:
+            try:
+                self.root.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+
+    def timer_tick(self):
+        """Called from update_timer on every run."""
+        self.last_tick = time.monotonic()
+
+    def _beat(self):
+        self.last_beat = time.monotonic()
+        self._after_id = self.root.after(self.heartbeat_ms, self._beat)
+
+    def _watch(self):
+        stalled_since = {"Mainloop": None, "update_timer": None}
+        while not self._stop_event.wait(self.heartbeat_ms / 1000):
+            self._check("Mainloop", self.last_beat, self.threshold, stalled_since)
+            if self.last_tick is not None:
+                self._check("update_timer", self.last_tick, self.tick_interval + self.threshold, stalled_since)
+
+    def _check(self, name, last_seen, allowed, stalled_since):
+        if stalled_since[name] is not None:
+            if last_seen != stalled_since[name]:
+                self.logger.warning(f"{name} recovered after {(last_seen - stalled_since[name]) * 1000:.0f} ms.")
+                stalled_since[name] = None
+            return
+        stalled_for = time.monotonic() - last_seen
+        if stalled_for >= allowed:
+            stalled_since[name] = last_seen
+            self._report_stall(name, stalled_for)
+
+    def _report_stall(self, name, stalled_for):
+        """Logs the Tk thread's current stack; the stall is still in progress at this point."""
+        frame = sys._current_frames().get(self.tk_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame else "<Tk thread not found>\n"
+        self.logger.warning(f"{name} stalled for {stalled_for * 1000:.0f} ms. Tk thread stack:\n{stack.rstrip()}")
+
 class FocusSessionApp:
-    def __init__(self, root_window):
+    def __init__(self, root_window, instance=None):
         self.root = root_window
+        self.instance = instance
         self.settings = {}
         self.load_settings()
 
@@ -94,6 +286,11 @@ class FocusSessionApp:
         self.quotes = []
         self.available_quotes = []
 
+        self.watchdog = None
+        self.profiler = None
+        self.profiler_active = False
+        self.tracemalloc_snapshot = None
+
         # --- Run startup tasks ---
         self._check_for_backup_reminder()
         self.load_quotes()
@@ -107,6 +304,14 @@ class FocusSessionApp:
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.force_indicator_topmost_loop()
 
+        if self.settings["watchdog_enabled"]:
+            self.watchdog = MainloopWatchdog(self.root, self.logger, threshold_ms=self.settings["watchdog_threshold_ms"])
+            self.watchdog.start()
+        if self.settings["profiler_enabled_on_start"]:
+            self.toggle_profiler()
+        if self.instance:
+            self.poll_instance_requests()
+
     def setup_logging(self):
         logging.basicConfig(level=logging.INFO, 
                             format='%(asctime)s - %(levelname)s - %(message)s',
@@ -231,6 +436,7 @@ class FocusSessionApp:
         file_menu.add_command(label="⚙️ Settings", command=self.open_settings)
         file_menu.add_command(label="📊 Statistics (Last 14 Days)", command=self.show_statistics)
         file_menu.add_command(label="📁 Open Log File", command=self.open_log_file)
+        file_menu.add_command(label="⏱️ Toggle Profiler", command=self.toggle_profiler)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.on_closing)
         menubar.add_cascade(label="File", menu=file_menu)
@@ -284,7 +490,7 @@ class FocusSessionApp:
             return
 
         try:
-            with open(LOG_FILE, 'r+', encoding='utf-8') as f:
+            with file_lock(LOG_LOCK_FILE), open(LOG_FILE, 'r+', encoding='utf-8') as f:
                 header = f.readline()
                 f.seek(0)
                 f.truncate()
@@ -352,6 +558,8 @@ class FocusSessionApp:
             self.obstacle_label.pack_forget()
 
     def update_timer(self):
+        if self.watchdog:
+            self.watchdog.timer_tick()
         display_time = None
         display_color = self.colors['bg_alt']
         if self.state == "SESSION_RUNNING":
@@ -425,9 +633,9 @@ class FocusSessionApp:
         self.switch_view()
 
     def log_session(self, mbs_checked, bt_checked):
-        file_exists = os.path.isfile(LOG_FILE) and os.path.getsize(LOG_FILE) > 0
         headers = ["timestamp", "task_completed", "mbs", "bt", "is_pre_noon", "obstacle_count", "total_obstacle_time_min"]
-        with open(LOG_FILE, 'a', newline='', encoding='utf-8') as f:
+        with file_lock(LOG_LOCK_FILE), open(LOG_FILE, 'a', newline='', encoding='utf-8') as f:
+            file_exists = f.tell() > 0
             writer = csv.writer(f)
             if not file_exists:
                 writer.writerow(headers)
@@ -642,8 +850,68 @@ class FocusSessionApp:
             if not messagebox.askyesno("Exit?", "A session is in progress. Are you sure you want to exit?"):
                 return
         self.destroy_status_indicator()
+        if self.watchdog:
+            self.watchdog.stop()
+        if self.instance:
+            self.instance.release()
+        self._dump_profile()
         self.root.destroy()
-    
+
+    def poll_instance_requests(self):
+        while True:
+            try:
+                request = self.instance.requests.get_nowait()
+            except queue.Empty:
+                break
+            self.handle_instance_request(request)
+        self.root.after(200, self.poll_instance_requests)
+
+    def handle_instance_request(self, request):
+        """Runs on the Tk thread for requests forwarded by a second launch (or passed on the command line)."""
+        self.logger.info(f"Received instance request: {request.get('command')}")
+        self.root.deiconify()
+        self.root.lift()
+        self.root.focus_force()
+        if request.get("command") == "start":
+            if self.state != "IDLE":
+                self.logger.info("Ignoring start request: a session is already in progress.")
+                return
+            self.task_entry.delete(0, tk.END)
+            self.task_entry.insert(0, request.get("task", ""))
+            self.start_session()
+
+    def toggle_profiler(self):
+        """Starts or pauses cProfile and tracemalloc capture on the Tk thread."""
+        if not self.profiler_active:
+            if self.profiler is None:
+                self.profiler = cProfile.Profile()
+            self.profiler.enable()
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self.profiler_active = True
+            self.logger.info("Profiler started.")
+        else:
+            self.profiler.disable()
+            self.tracemalloc_snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            self.profiler_active = False
+            self.logger.info("Profiler paused.")
+
+    def _dump_profile(self):
+        """Writes the accumulated profile to PROFILE_FILE and the top allocations to the app log."""
+        if self.profiler_active:
+            self.toggle_profiler()
+        if self.profiler is None:
+            return
+        try:
+            self.profiler.dump_stats(PROFILE_FILE)
+            self.logger.info(f"Profile saved to {PROFILE_FILE}.")
+        except IOError as e:
+            self.logger.error(f"Could not save profile: {e}")
+        if self.tracemalloc_snapshot:
+            top_stats = self.tracemalloc_snapshot.statistics('lineno')[:10]
+            self.logger.info("Top memory allocations:\n" + "\n".join(str(stat) for stat in top_stats))
+
     def create_status_indicator(self):
         if self.status_indicator and self.status_indicator.winfo_exists():
             return
@@ -684,7 +952,29 @@ class FocusSessionApp:
                 pass
         self.root.after(20000, self.force_indicator_topmost_loop)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Focus session timer.")
+    parser.add_argument("--task", help="start a session with this task (in the running instance, if any)")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    request = {"command": "start", "task": args.task} if args.task else {"command": "show"}
+    instance = SingleInstance()
+    if not instance.acquire():
+        if instance.forward(request):
+            sys.exit(0)
+        logging.basicConfig(level=logging.INFO,
+                            format='%(asctime)s - %(levelname)s - %(message)s',
+                            handlers=[logging.FileHandler(APP_LOG_FILE, encoding='utf-8')])
+        logging.getLogger(__name__).error("Another instance is running but did not respond.")
+        error_window = tk.Tk()
+        error_window.withdraw()
+        messagebox.showerror("Focus", "Focus is already running but did not respond.\nClose it and try again.")
+        error_window.destroy()
+        sys.exit(1)
+    if args.task:
+        instance.requests.put(request)
     main_window = tk.Tk()
-    app = FocusSessionApp(main_window)
-    main_window.mainloop()
\ No newline at end of file
+    app = FocusSessionApp(main_window, instance)
+    main_window.mainloop()
\ No newline at end of file